@@ -0,0 +1,361 @@
+"""
+Funciones de obtención de datos (CCL implícito e IPC) compartidas por la aplicación.
+Al vivir en un módulo importado, no se vuelven a ejecutar en cada rerun del script.
+"""
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import yfinance as yf
+
+# --- FUNCIONES DE OBTENCIÓN DE DATOS (CON CACHÉ) ---
+
+@st.cache_resource
+def get_http_session():
+    """
+    Devuelve una sesión HTTP compartida entre reruns y usuarios.
+    Reutiliza las conexiones (keep-alive) para no pagar el handshake TCP+TLS en cada pedido
+    y reintenta brevemente ante errores transitorios (5xx o conexión rechazada).
+    Un servidor colgado (timeout de lectura) no se reintenta, para no multiplicar la espera del timeout.
+    Las respuestas viajan comprimidas: requests ya envía Accept-Encoding con gzip/deflate
+    (y br si está instalado brotli), por eso no se fuerza ese header acá.
+    """
+    session = requests.Session()
+    session.headers.update({'User-Agent': 'mep-hoy/1.0'})
+    reintentos = Retry(total=3, connect=1, read=0, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=reintentos)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_respuestas_guardadas():
+    """
+    Guarda, por URL, el último ETag/Last-Modified recibido junto con el JSON ya decodificado.
+    Sobrevive al vencimiento del TTL de st.cache_data para poder hacer pedidos condicionales.
+    """
+    return {}
+
+
+def get_json(url, timeout=20):
+    """
+    Descarga y decodifica un JSON con un GET condicional (If-None-Match / If-Modified-Since).
+    Si el servidor responde 304 (sin cambios) se reutiliza la respuesta anterior,
+    evitando volver a descargar y parsear todo el payload.
+    """
+    guardadas = get_respuestas_guardadas()
+    anterior = guardadas.get(url)
+
+    headers = {}
+    if anterior is not None:
+        if anterior['etag']:
+            headers['If-None-Match'] = anterior['etag']
+        if anterior['last_modified']:
+            headers['If-Modified-Since'] = anterior['last_modified']
+
+    response = get_http_session().get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and anterior is not None:
+        return anterior['data']
+
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        guardadas[url] = {'etag': etag, 'last_modified': last_modified, 'data': data}
+    return data
+
+
+CACHE_DIR = Path(__file__).parent / ".cache"  # Copias en disco de las descargas de Yahoo Finance
+DISK_CACHE_TTL = 6 * 3600  # Segundos durante los cuales la copia en disco se usa sin ir a la red
+INTENTOS_YAHOO = 3  # Pedidos a Yahoo Finance antes de darse por vencido
+
+
+def _has_all_tickers(df, tickers):
+    """True si el DataFrame trae al menos un cierre para cada uno de los `tickers`."""
+    return not df.empty and bool(df[list(tickers)].notna().any().all())
+
+
+def _download_closes(tickers, start_date, exigir_todos=True):
+    """
+    Descarga de Yahoo Finance, en un único pedido, el cierre ajustado de todos los `tickers`.
+    Devuelve un DataFrame con la columna 'fecha' y una columna de cierre por ticker
+    (NaN en los días en que ese mercado no operó).
+    Ante una respuesta vacía (típica de un 429 de Yahoo) reintenta con backoff exponencial y jitter,
+    así la espera sólo se paga cuando realmente hay un rechazo. Con `exigir_todos` (historia completa)
+    también reintenta si algún ticker no trae ningún cierre (yfinance deja esa columna toda en NaN
+    cuando falla un ticker); en una ventana corta eso puede ser sólo un feriado de ese mercado.
+    Si tras los reintentos falta algún ticker, devuelve lo que haya llegado.
+    """
+    for intento in range(INTENTOS_YAHOO):
+        datos = yf.download(
+            list(tickers), start=start_date, progress=False, auto_adjust=True,
+            group_by='ticker', threads=True
+        )
+        if datos.empty:
+            df = pd.DataFrame(columns=['fecha', *tickers])
+        else:
+            presentes = set(datos.columns.get_level_values(0))
+            df = pd.DataFrame({
+                ticker: datos[ticker]['Close'] if ticker in presentes else np.nan
+                for ticker in tickers
+            })
+            df = df.dropna(how='all').rename_axis('fecha').reset_index()
+
+        completo = _has_all_tickers(df, tickers) if exigir_todos else not df.empty
+        if completo or intento == INTENTOS_YAHOO - 1:
+            break
+        time.sleep(0.5 * 2 ** intento + random.uniform(0, 0.5))
+
+    return df
+
+
+def _same_closes(anterior, nueva):
+    """
+    Compara la fila superpuesta. Un NaN anterior que ahora tiene valor también cuenta como cambio:
+    indica que ese ticker había fallado y hay que volver a bajar la historia completa.
+    """
+    anterior = anterior.to_numpy(dtype=float)
+    nueva = nueva.to_numpy(dtype=float)
+    return bool(np.allclose(anterior, nueva, rtol=1e-6, equal_nan=True))
+
+
+def download_closes_cached(tickers, start_date):
+    """
+    Devuelve el cierre diario de `tickers` desde `start_date`, con una copia en disco (parquet).
+    - Si la copia tiene menos de DISK_CACHE_TTL, se usa directamente sin ir a la red.
+    - Si no, solo se descargan las filas desde la anteúltima fecha guardada y reemplazan a las guardadas
+      desde esa fecha (la última fila pudo guardarse con un precio parcial, en plena rueda).
+      Si el anteúltimo cierre guardado cambió (ajuste por dividendos/splits) o la copia tiene
+      un ticker sin datos, se vuelve a bajar todo.
+    - Si Yahoo no devuelve datos, se usa la copia vencida como último recurso.
+    - Una descarga en la que falló algún ticker se devuelve, pero no se guarda en disco.
+    Devuelve un DataFrame con columnas ['fecha', *tickers] (vacío si no hay datos).
+    """
+    tickers = tuple(tickers)
+    ruta = CACHE_DIR / f"{'_'.join(tickers)}_{start_date}.parquet"
+
+    guardado = None
+    if ruta.exists():
+        try:
+            guardado = pd.read_parquet(ruta)
+        except Exception:
+            guardado = None  # Copia corrupta o ilegible: se ignora y se vuelve a descargar
+        else:
+            if not _has_all_tickers(guardado, tickers):
+                guardado = None  # Copia con un ticker faltante: no sirve ni como respaldo
+            elif time.time() - ruta.stat().st_mtime < DISK_CACHE_TTL:
+                return guardado
+
+    if guardado is None or len(guardado) < 2:
+        df = _download_closes(tickers, start_date)
+    else:
+        # Pedir desde la anteúltima fecha guardada (inclusive), que ya es una rueda cerrada, para comparar esa fila
+        fecha_control = guardado['fecha'].iloc[-2]
+        nuevos = _download_closes(tickers, fecha_control.strftime('%Y-%m-%d'), exigir_todos=False)
+        if nuevos.empty:
+            return guardado
+
+        superpuesta = nuevos[nuevos['fecha'] == fecha_control]
+        if not superpuesta.empty and _same_closes(guardado[list(tickers)].iloc[-2], superpuesta[list(tickers)].iloc[0]):
+            df = pd.concat([guardado.iloc[:-2], nuevos], ignore_index=True)
+        else:
+            df = _download_closes(tickers, start_date)
+
+    if df.empty:
+        return guardado if guardado is not None else df
+    if not _has_all_tickers(df, tickers):
+        return df  # Algún ticker falló: no se persiste, en el próximo pedido se vuelve a intentar
+
+    temporal = None
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        # Escribir a un temporal propio de este pedido y reemplazar: las sesiones de Streamlit son hilos
+        # del mismo proceso y pueden estar actualizando el mismo archivo a la vez
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, prefix=f"{ruta.stem}.", suffix=".tmp", delete=False) as archivo:
+            temporal = archivo.name
+        df.to_parquet(temporal, index=False, compression="zstd")
+        os.replace(temporal, ruta)
+    except Exception:
+        # Sin copia en disco (p. ej. sistema de archivos de solo lectura): se sigue igual
+        if temporal is not None and os.path.exists(temporal):
+            os.remove(temporal)
+
+    return df
+
+
+@st.cache_data(ttl=3600)  # Cachea los datos por 1 hora
+def get_ccl_from_ggal(start_date="2015-01-01"):
+    """
+    Calcula el Dólar CCL implícito desde `start_date` (AAAA-MM-DD) siguiendo una lógica específica:
+    1. Descarga en un solo pedido a Yahoo Finance el ADR en USD (GGAL, crítico) y la acción en ARS (GGAL.BA).
+    2. Si GGAL.BA no trae datos, usa data912.com como respaldo para el precio en ARS.
+    """
+    df_ars = None
+    df_usd = None
+
+    # Paso 1: Obtener GGAL ADR en USD y GGAL.BA en ARS (un único pedido a Yahoo Finance)
+    try:
+        # La copia en disco se guarda por año de inicio, así cualquier fecha de ese año la reutiliza
+        cierres = download_closes_cached(("GGAL", "GGAL.BA"), f"{start_date[:4]}-01-01")
+        # Las fechas vienen ordenadas: una búsqueda binaria ubica el inicio sin armar una máscara
+        cierres = cierres.iloc[cierres['fecha'].searchsorted(pd.Timestamp(start_date)):]
+
+        df_usd = cierres[['fecha', 'GGAL']].dropna().rename(columns={'GGAL': 'ggal_usd'})
+        if df_usd.empty:
+            raise ValueError("No se pudieron obtener los datos del ADR (GGAL) desde Yahoo Finance.")
+    except Exception as e_adr:
+        st.error(f"Error crítico: No se pudo obtener el precio en Dólares desde Yahoo Finance. {e_adr}")
+        return None
+
+    # Paso 2: Usar GGAL.BA de Yahoo Finance si vino con datos
+    try:
+        df_ars = cierres[['fecha', 'GGAL.BA']].dropna().rename(columns={'GGAL.BA': 'ggal_ars'})
+        if df_ars.empty:
+            raise ValueError("yf.download() para GGAL.BA devolvió un DataFrame vacío.")
+    except Exception as e_yf_ba:
+        st.warning(f"Falló la obtención de GGAL.BA desde Yahoo Finance: {e_yf_ba}. Usando respaldo...")
+        # Paso 3: Fallback para el precio en ARS desde data912.com
+        try:
+            url_ars = "https://data912.com/historical/stocks/ggal"
+            data_ars = get_json(url_ars)
+            # Armar solo las dos columnas necesarias, sin materializar el resto de los campos
+            df_ars = pd.DataFrame({
+                'fecha': pd.to_datetime([registro['date'] for registro in data_ars], format='ISO8601'),
+                'ggal_ars': np.array([registro['c'] for registro in data_ars], dtype=np.float64)
+            })
+        except Exception as e_fallback:
+            st.error(f"Falló también la fuente de respaldo para el precio en Pesos: {e_fallback}")
+            return None
+
+    # Paso 4: Unir los DataFrames y calcular
+    if df_ars is not None and df_usd is not None:
+        # CORRECCIÓN: Verificar que ambos DataFrames tengan datos
+        if df_ars.empty or df_usd.empty:
+            st.error("Uno o ambos DataFrames están vacíos.")
+            return None
+            
+        # Join alineado por índice de fechas (evita armar tablas hash como pd.merge)
+        try:
+            df = df_ars.set_index('fecha').join(
+                df_usd.set_index('fecha'), how='inner', validate='one_to_one'
+            ).reset_index()
+        except pd.errors.MergeError as e_join:
+            st.error(f"Las series de precios en ARS y USD tienen fechas duplicadas: {e_join}")
+            return None
+        df.dropna(inplace=True)
+        # Ordenar una sola vez acá (queda cacheado) para no reordenar en cada rerun
+        df.sort_values('fecha', inplace=True)
+        
+        # CORRECCIÓN: Verificar que el merge produjo resultados
+        if df.empty:
+            st.error("No se encontraron fechas comunes entre los datos de ARS y USD.")
+            return None
+            
+        # CORRECCIÓN: Eliminar .squeeze() y agregar validación
+        # float32 alcanza para precios (~7 dígitos) y reduce a la mitad memoria y JSON enviado al navegador
+        df['ccl_nominal'] = ((df['ggal_ars'] / df['ggal_usd']) * 10).astype(np.float32)
+        df_ccl = df[['fecha', 'ccl_nominal']]
+        
+        # Filtrar valores válidos
+        df_ccl = df_ccl[df_ccl['ccl_nominal'] > 0].reset_index(drop=True)
+        
+        if df_ccl.empty:
+            st.error("No se pudieron calcular valores válidos de CCL.")
+            return None
+            
+        return df_ccl
+    else:
+        st.error("No se pudieron consolidar los datos de precios en ARS y USD.")
+        return None
+
+
+# Datos oficiales de inflación mensual 2025 (fuente: INDEC), confirmados hasta junio 2025.
+# Se usan para completar el IPC cuando la API todavía no publicó esos meses.
+INFLACION_2025_FECHAS = np.array([
+    '2025-01-01', '2025-02-01', '2025-03-01', '2025-04-01', '2025-05-01', '2025-06-01'
+], dtype='datetime64[ns]')
+INFLACION_2025_MENSUAL = np.array([
+    2.2,  # Enero 2025: 2.2%
+    2.4,  # Febrero 2025: 2.4%
+    3.7,  # Marzo 2025: 3.7%
+    2.8,  # Abril 2025: 2.8%
+    1.5,  # Mayo 2025: 1.5%
+    1.6,  # Junio 2025: 1.6% (OFICIAL)
+])
+
+
+@st.cache_data(ttl=86400)  # Cachea el IPC por 24 horas
+def get_ipc_from_datos_gob_ar():
+    """
+    Obtiene el IPC Nacional (base Dic 2016) desde la API de datos.gob.ar.
+    Si no hay datos recientes, los complementa con datos manuales actualizados.
+    ID de la serie: 148.3_INIVELNAL_DICI_M_26
+    """
+    url = "https://apis.datos.gob.ar/series/api/series/?ids=148.3_INIVELNAL_DICI_M_26"
+    try:
+        data = get_json(url)
+        
+        # CORRECCIÓN: Verificar estructura de respuesta
+        if 'data' not in data:
+            raise ValueError("La respuesta de la API no contiene el campo 'data'")
+            
+        if not data['data']:
+            raise ValueError("No se obtuvieron datos válidos de IPC")
+
+        # Construir las columnas ya tipadas: fechas ISO con formato explícito y valores
+        # como float64 (los null de la API quedan como NaN)
+        fechas, valores = zip(*data['data'])
+        df = pd.DataFrame({
+            'fecha': pd.to_datetime(list(fechas), format='%Y-%m-%d'),
+            'ipc': np.array(valores, dtype=np.float64)
+        })
+
+        # CORRECCIÓN: Eliminar los meses sin dato
+        df.dropna(inplace=True)
+        
+        if df.empty:
+            raise ValueError("No se obtuvieron datos válidos de IPC")
+        
+        df['fecha'] = df['fecha'].dt.to_period('M').dt.to_timestamp()
+        df = df.sort_values('fecha', ignore_index=True)
+        
+        # MEJORA: Agregar datos faltantes de 2025 si la API no los tiene
+        ultimo_dato = df['fecha'].max()
+        
+        if ultimo_dato < INFLACION_2025_FECHAS[-1]:
+            # Obtener el último IPC para calcular los nuevos valores
+            ultimo_ipc = df['ipc'].iloc[-1]
+            
+            # Calcular IPC acumulado para los meses que faltan (un cumprod y una sola concatenación)
+            faltantes = INFLACION_2025_FECHAS > ultimo_dato
+            factores = np.cumprod(1 + INFLACION_2025_MENSUAL[faltantes] / 100)
+            nuevos_datos = pd.DataFrame({
+                'fecha': INFLACION_2025_FECHAS[faltantes].astype(df['fecha'].dtype),  # Misma resolución que la API
+                'ipc': ultimo_ipc * factores
+            })
+            df = pd.concat([df, nuevos_datos], ignore_index=True)
+            
+            st.info("✅ Datos de IPC actualizados con información oficial del INDEC hasta junio 2025 (1,6%)")
+        
+        # El acumulado se calcula en float64; el resultado se guarda en float32 como el resto de las series
+        df['ipc'] = df['ipc'].astype(np.float32)
+        return df
+
+    except requests.RequestException as e:
+        st.error(f"Error al conectar con la API de datos.gob.ar: {e}")
+        return None
+    except (KeyError, ValueError) as e:
+        st.error(f"Error procesando los datos de IPC: {e}")
+        return None
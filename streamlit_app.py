@@ -1,9 +1,12 @@
 import streamlit as st
-import pandas as pd
-import requests
+import numpy as np
+import threading
 import plotly.graph_objects as go
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import yfinance as yf
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from data_sources import get_ccl_from_ggal, get_ipc_from_datos_gob_ar
 
 # --- CONFIGURACIÓN DE LA PÁGINA ---
 st.set_page_config(
@@ -19,251 +22,232 @@ Esta aplicación visualiza la serie histórica del **Dólar Contado con Liquidac
 para reflejar su valor en pesos de hoy. El cálculo se basa en la cotización de las acciones de **Grupo Financiero Galicia (GGAL)**.
 """)
 
-# --- FUNCIONES DE OBTENCIÓN DE DATOS (CON CACHÉ) ---
+# --- FUNCIONES AUXILIARES ---
+
+MAX_PUNTOS_GRAFICO = 2000  # Puntos máximos que se envían al navegador
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Reduce una serie con el algoritmo Largest-Triangle-Three-Buckets (LTTB).
+    Devuelve las posiciones de los puntos a conservar, de forma que la forma
+    visual de la serie se mantiene aunque se grafiquen muchos menos puntos.
+    Siempre conserva el primer y el último punto.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bordes de los n_out - 2 buckets intermedios (el primer y último punto van fijos)
+    bordes = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # Promedio del bucket siguiente (el último bucket usa el punto final)
+        sig_fin = bordes[i + 2] if i + 2 < len(bordes) else n
+        prom_x = x[fin:sig_fin].mean()
+        prom_y = y[fin:sig_fin].mean()
+
+        # Área del triángulo formado por el punto elegido, cada candidato y el promedio
+        areas = np.abs(
+            (x[a] - prom_x) * (y[inicio:fin] - y[a])
+            - (x[a] - x[inicio:fin]) * (prom_y - y[a])
+        )
+        a = inicio + int(areas.argmax())
+        indices[i + 1] = a
+
+    return indices
+
+
+def asof_backward(claves_izq, claves_der, valores_der):
+    """
+    Equivalente vectorizado de pd.merge_asof(direction='backward') para claves ya ordenadas:
+    para cada clave de la izquierda toma el último valor de la derecha con clave <= a ella.
+    Una sola búsqueda binaria vectorizada (np.searchsorted); NaN donde no hay valor previo.
+    """
+    posiciones = np.searchsorted(claves_der, claves_izq, side='right') - 1
+    resultado = np.full(len(claves_izq), np.nan, dtype=valores_der.dtype)
+    validas = posiciones >= 0
+    resultado[validas] = valores_der[posiciones[validas]]
+    return resultado
+
 
-@st.cache_data(ttl=3600)  # Cachea los datos por 1 hora
-def get_ccl_from_ggal(start_date="2015-01-01"):
+def ejecutar_en_paralelo(*funciones):
     """
-    Calcula el Dólar CCL implícito siguiendo una lógica específica:
-    1. Obtiene el precio en USD (ADR) desde Yahoo Finance (crítico).
-    2. Intenta obtener el precio en ARS desde Yahoo Finance.
-    3. Si el paso 2 falla, usa data912.com como respaldo para el precio en ARS.
+    Ejecuta las funciones (sin argumentos) en hilos separados y devuelve sus resultados en orden.
+    Los hilos heredan el contexto de Streamlit para que los mensajes (st.error, st.warning) se muestren.
     """
-    df_ars = None
-    df_usd = None
-
-    # Paso 1: Obtener GGAL ADR en USD (fuente única y crítica)
-    try:
-        ggal_adr = yf.download("GGAL", start=start_date, progress=False, auto_adjust=True)
-        if ggal_adr.empty:
-            raise ValueError("No se pudieron obtener los datos del ADR (GGAL) desde Yahoo Finance.")
-        
-        # CORRECCIÓN: Convertir a DataFrame correctamente
-        df_usd = ggal_adr[['Close']].copy()
-        df_usd.reset_index(inplace=True)
-        df_usd.columns = ['fecha', 'ggal_usd']
-    except Exception as e_adr:
-        st.error(f"Error crítico: No se pudo obtener el precio en Dólares desde Yahoo Finance. {e_adr}")
-        return None
-
-    # Paso 2: Intentar obtener GGAL en ARS desde Yahoo Finance
-    try:
-        ggal_ba = yf.download("GGAL.BA", start=start_date, progress=False, auto_adjust=True)
-        if ggal_ba.empty:
-            raise ValueError("yf.download() para GGAL.BA devolvió un DataFrame vacío.")
-        
-        # CORRECCIÓN: Convertir a DataFrame correctamente
-        df_ars = ggal_ba[['Close']].copy()
-        df_ars.reset_index(inplace=True)
-        df_ars.columns = ['fecha', 'ggal_ars']
-    except Exception as e_yf_ba:
-        st.warning(f"Falló la obtención de GGAL.BA desde Yahoo Finance: {e_yf_ba}. Usando respaldo...")
-        # Paso 3: Fallback para el precio en ARS desde data912.com
-        try:
-            url_ars = "https://data912.com/historical/stocks/ggal"
-            response_ars = requests.get(url_ars, timeout=20)
-            response_ars.raise_for_status()
-            data_ars = response_ars.json()
-            df_ars_fallback = pd.DataFrame(data_ars)
-            df_ars = df_ars_fallback[['date', 'c']].rename(columns={'date': 'fecha', 'c': 'ggal_ars'})
-            df_ars['fecha'] = pd.to_datetime(df_ars['fecha'])
-        except Exception as e_fallback:
-            st.error(f"Falló también la fuente de respaldo para el precio en Pesos: {e_fallback}")
-            return None
-
-    # Paso 4: Unir los DataFrames y calcular
-    if df_ars is not None and df_usd is not None:
-        # CORRECCIÓN: Verificar que ambos DataFrames tengan datos
-        if df_ars.empty or df_usd.empty:
-            st.error("Uno o ambos DataFrames están vacíos.")
-            return None
-            
-        df = pd.merge(df_ars, df_usd, on='fecha', how='inner')
-        df.dropna(inplace=True)
-        
-        # CORRECCIÓN: Verificar que el merge produjo resultados
-        if df.empty:
-            st.error("No se encontraron fechas comunes entre los datos de ARS y USD.")
-            return None
-            
-        # CORRECCIÓN: Eliminar .squeeze() y agregar validación
-        df['ccl_nominal'] = (df['ggal_ars'] / df['ggal_usd']) * 10
-        df_ccl = df[['fecha', 'ccl_nominal']]
-        
-        # Filtrar valores válidos
-        df_ccl = df_ccl[df_ccl['ccl_nominal'] > 0]
-        
-        if df_ccl.empty:
-            st.error("No se pudieron calcular valores válidos de CCL.")
-            return None
-            
-        return df_ccl
-    else:
-        st.error("No se pudieron consolidar los datos de precios en ARS y USD.")
-        return None
-
-
-@st.cache_data(ttl=86400)  # Cachea el IPC por 24 horas
-def get_ipc_from_datos_gob_ar():
+    ctx = get_script_run_ctx()
+
+    def con_contexto(funcion):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return funcion()
+
+    with ThreadPoolExecutor(max_workers=len(funciones)) as executor:
+        futuros = [executor.submit(con_contexto, funcion) for funcion in funciones]
+        return [futuro.result() for futuro in futuros]
+
+# --- PROCESAMIENTO (CON CACHÉ) ---
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def build_merged(df_ccl, df_ipc):
+    """
+    Une el CCL diario con el IPC mensual y calcula el CCL ajustado a precios de hoy.
+    Queda cacheado: en los reruns con los mismos datos no se repite ningún cálculo.
     """
-    Obtiene el IPC Nacional (base Dic 2016) desde la API de datos.gob.ar.
-    Si no hay datos recientes, los complementa con datos manuales actualizados.
-    ID de la serie: 148.3_INIVELNAL_DICI_M_26
+    # 1. Asignar a cada día el último IPC mensual publicado (ambas funciones ya los devuelven ordenados)
+    fechas_ccl = df_ccl['fecha'].to_numpy(dtype='datetime64[ns]')
+    fechas_ipc = df_ipc['fecha'].to_numpy(dtype='datetime64[ns]')
+    if not (df_ccl['fecha'].is_monotonic_increasing and df_ipc['fecha'].is_monotonic_increasing):
+        raise ValueError("Las series de CCL e IPC deben estar ordenadas por fecha.")
+
+    df_merged = df_ccl.assign(
+        ipc=asof_backward(fechas_ccl, fechas_ipc, df_ipc['ipc'].to_numpy())
+    )
+    df_merged.dropna(inplace=True)
+
+    if df_merged.empty:
+        return df_merged
+
+    # 2. Calcular el CCL ajustado a precios de hoy directamente sobre arrays de NumPy
+    #    (float32 alcanza para precios y mitad de tráfico de memoria; un solo buffer de salida)
+    nominal = df_merged['ccl_nominal'].to_numpy(dtype=np.float32)
+    ipc = df_merged['ipc'].to_numpy(dtype=np.float32)
+    ajustado = np.empty_like(nominal)
+    np.divide(ipc[-1], ipc, out=ajustado)
+    np.multiply(nominal, ajustado, out=ajustado)
+    df_merged['ccl_ajustado'] = ajustado
+
+    return df_merged
+
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def build_figure(df_merged, hover_unificado=False):
     """
-    url = "https://apis.datos.gob.ar/series/api/series/?ids=148.3_INIVELNAL_DICI_M_26"
-    try:
-        response = requests.get(url, timeout=20)
-        response.raise_for_status()
-        data = response.json()
-        
-        # CORRECCIÓN: Verificar estructura de respuesta
-        if 'data' not in data:
-            raise ValueError("La respuesta de la API no contiene el campo 'data'")
-            
-        df = pd.DataFrame(data['data'], columns=['fecha', 'ipc'])
-        df['fecha'] = pd.to_datetime(df['fecha'])
-        df['ipc'] = pd.to_numeric(df['ipc'], errors='coerce')
-        
-        # CORRECCIÓN: Eliminar valores nulos después de la conversión
-        df.dropna(inplace=True)
-        
-        if df.empty:
-            raise ValueError("No se obtuvieron datos válidos de IPC")
-        
-        df['fecha'] = df['fecha'].dt.to_period('M').dt.to_timestamp()
-        df = df.sort_values('fecha')
-        
-        # MEJORA: Agregar datos faltantes de 2025 si la API no los tiene
-        ultimo_dato = df['fecha'].max()
-        fecha_junio_2025 = pd.Timestamp('2025-06-01')
-        
-        if ultimo_dato < fecha_junio_2025:
-            # Obtener el último IPC para calcular los nuevos valores
-            ultimo_ipc = df['ipc'].iloc[-1]
-            
-            # Datos oficiales de inflación mensual 2025 (fuente: INDEC)
-            # Actualizados con datos confirmados hasta junio 2025
-            datos_2025 = [
-                ('2025-01-01', 2.2),  # Enero 2025: 2.2%
-                ('2025-02-01', 2.4),  # Febrero 2025: 2.4%
-                ('2025-03-01', 3.7),  # Marzo 2025: 3.7%
-                ('2025-04-01', 2.8),  # Abril 2025: 2.8%
-                ('2025-05-01', 1.5),  # Mayo 2025: 1.5%
-                ('2025-06-01', 1.6),  # Junio 2025: 1.6% (OFICIAL)
-            ]
-            
-            # Calcular IPC acumulado para cada mes
-            ipc_actual = ultimo_ipc
-            for fecha_str, inflacion_mensual in datos_2025:
-                fecha = pd.Timestamp(fecha_str)
-                if fecha > ultimo_dato:
-                    ipc_actual = ipc_actual * (1 + inflacion_mensual/100)
-                    nuevo_dato = pd.DataFrame({
-                        'fecha': [fecha],
-                        'ipc': [ipc_actual]
-                    })
-                    df = pd.concat([df, nuevo_dato], ignore_index=True)
-            
-            st.info("✅ Datos de IPC actualizados con información oficial del INDEC hasta junio 2025 (1,6%)")
-        
-        return df
-
-    except requests.RequestException as e:
-        st.error(f"Error al conectar con la API de datos.gob.ar: {e}")
-        return None
-    except (KeyError, ValueError) as e:
-        st.error(f"Error procesando los datos de IPC: {e}")
-        return None
+    Arma el gráfico de Plotly a partir del DataFrame ya procesado.
+    El hover unificado ('x unified') es más pesado en series largas, por eso es opcional.
+    Se cachea como recurso: todos los reruns reciben el mismo objeto ya validado,
+    sin volver a deserializarlo ni pasar por los validadores de Plotly. No modificarlo.
+    """
+    fig = go.Figure()
+
+    # Reducir la serie con LTTB para no enviar miles de puntos al navegador
+    indices = lttb_indices(
+        df_merged['fecha'].to_numpy(dtype='int64').astype(float),
+        df_merged['ccl_ajustado'].to_numpy(),
+        MAX_PUNTOS_GRAFICO
+    )
+    df_grafico = df_merged.iloc[indices]
+
+    # Línea principal del CCL ajustado (WebGL para series largas)
+    fig.add_trace(go.Scattergl(
+        x=df_grafico['fecha'],
+        y=df_grafico['ccl_ajustado'],
+        mode='lines',
+        name='Dólar CCL ajustado',
+        line=dict(color='#00BFFF', width=2.5),
+        # El hover lo formatea Plotly.js en el navegador: sólo viaja el CCL nominal como customdata
+        customdata=df_grafico['ccl_nominal'].to_numpy(dtype=np.float32),
+        hovertemplate=(
+            "<b>Fecha:</b> %{x|%d-%m-%Y}<br><b>CCL Ajustado:</b> $%{y:,.2f}"
+            "<br><b>CCL Nominal:</b> $%{customdata:,.2f}<extra></extra>"
+        )
+    ))
+
+    # Línea punteada del valor mínimo
+    valor_minimo = df_merged['ccl_ajustado'].min()
+    fig.add_hline(
+        y=valor_minimo,
+        line_dash="dash",
+        line_color="red",
+        annotation_text=f"Mínimo: ${valor_minimo:,.2f}",
+        annotation_position="top right"
+    )
+
+    # Configurar el layout del gráfico
+    fig.update_layout(
+        template='plotly_dark',
+        title='<b>Dólar CCL a Precios de Hoy (Ajustado por IPC)</b>',
+        yaxis_title='Valor en Pesos Argentinos (de hoy)',
+        xaxis_title='Fecha',
+        height=800,  # Aumentado de 600 a 800
+        hovermode='x unified' if hover_unificado else 'x',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        yaxis=dict(tickprefix="$", tickformat=",.0f")
+    )
+
+    return fig
 
 # --- LÓGICA PRINCIPAL DE LA APLICACIÓN ---
+
+# Por defecto ~6 años de historia desde el 1 de enero (la fecha cambia una vez por año y la caché
+# sigue sirviendo). El IPC base Dic 2016 marca el inicio más antiguo que se puede ajustar.
+hoy = datetime.today()
+fecha_desde = st.sidebar.date_input(
+    "Desde",
+    value=datetime(hoy.year - 6, 1, 1).date(),
+    min_value=datetime(2016, 12, 1).date(),
+    max_value=hoy.date(),
+    help="Inicio de la serie. Más historia implica más datos para descargar y graficar."
+)
+
 with st.spinner("Cargando y procesando datos... (puede tardar un momento la primera vez)"):
-    df_ccl = get_ccl_from_ggal()
-    df_ipc = get_ipc_from_datos_gob_ar()
-
-    if df_ccl is not None and df_ipc is not None and not df_ccl.empty and not df_ipc.empty:
-        try:
-            # 1. Unir los dos DataFrames.
-            df_merged = pd.merge_asof(
-                df_ccl.sort_values('fecha'),
-                df_ipc.sort_values('fecha'),
-                on='fecha',
-                direction='backward'
-            )
-            df_merged.dropna(inplace=True)
-            
-            # CORRECCIÓN: Verificar que el merge_asof funcionó
-            if df_merged.empty:
-                st.error("No se pudieron combinar los datos de CCL e IPC. Verifique que las fechas se solapen.")
-                st.stop()
-
-            # 2. Calcular el CCL ajustado a precios de hoy
-            ipc_actual = df_merged['ipc'].iloc[-1]
-            fecha_ultimo_ipc = df_ipc['fecha'].iloc[-1]
-            
-            df_merged['ccl_ajustado'] = df_merged['ccl_nominal'] * (ipc_actual / df_merged['ipc'])
-
-            # 3. Crear el gráfico con Plotly
-            fig = go.Figure()
-
-            # Línea principal del CCL ajustado
-            fig.add_trace(go.Scatter(
-                x=df_merged['fecha'],
-                y=df_merged['ccl_ajustado'],
-                mode='lines',
-                name='Dólar CCL ajustado',
-                line=dict(color='#00BFFF', width=2.5),
-                hoverinfo='text',
-                hovertext=[
-                    f"<b>Fecha:</b> {row.fecha.strftime('%d-%m-%Y')}<br>"
-                    f"<b>CCL Ajustado:</b> ${row.ccl_ajustado:,.2f}<br>"
-                    f"<b>CCL Nominal:</b> ${row.ccl_nominal:,.2f}"
-                    for row in df_merged.itertuples()
-                ]
-            ))
-            
-            # Línea punteada del valor mínimo
-            valor_minimo = df_merged['ccl_ajustado'].min()
-            fig.add_hline(
-                y=valor_minimo,
-                line_dash="dash",
-                line_color="red",
-                annotation_text=f"Mínimo: ${valor_minimo:,.2f}",
-                annotation_position="top right"
-            )
-            
-            # 4. Configurar el layout del gráfico
-            fig.update_layout(
-                template='plotly_dark',
-                title='<b>Dólar CCL a Precios de Hoy (Ajustado por IPC)</b>',
-                yaxis_title='Valor en Pesos Argentinos (de hoy)',
-                xaxis_title='Fecha',
-                height=800,  # Aumentado de 600 a 800
-                hovermode='x unified',
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                yaxis=dict(tickprefix="$", tickformat=",.0f")
-            )
-
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Expansor para mostrar los datos en una tabla
-            with st.expander("Ver tabla de datos completos"):
-                st.dataframe(
-                    df_merged[['fecha', 'ccl_nominal', 'ipc', 'ccl_ajustado']].style.format({
-                        'ccl_nominal': '${:,.2f}',
-                        'ipc': '{:.2f}',
-                        'ccl_ajustado': '${:,.2f}',
-                        'fecha': '{:%d-%m-%Y}'
-                    }),
-                    use_container_width=True
-                )
-                
-        except Exception as e:
-            st.error(f"Error procesando los datos: {e}")
-            st.error("Por favor, intente recargar la página o contacte al administrador.")
-
-    else:
-        st.error("No se pudieron cargar todos los datos necesarios para generar el gráfico.")
-        st.error("Por favor, intente de nuevo más tarde o verifique su conexión a internet.")
+    # Ambas fuentes son independientes: se descargan en paralelo
+    df_ccl, df_ipc = ejecutar_en_paralelo(
+        lambda: get_ccl_from_ggal(fecha_desde.strftime('%Y-%m-%d')),
+        get_ipc_from_datos_gob_ar
+    )
+
+# Sin alguna de las dos series no hay nada que calcular: se corta el script acá
+if df_ccl is None or df_ccl.empty or df_ipc is None or df_ipc.empty:
+    st.error("No se pudieron cargar todos los datos necesarios para generar el gráfico.")
+    st.error("Por favor, intente de nuevo más tarde o verifique su conexión a internet.")
+    st.stop()
+
+try:
+    df_merged = build_merged(df_ccl, df_ipc)
+
+    # CORRECCIÓN: Verificar que la unión con el IPC funcionó
+    if df_merged.empty:
+        st.error("No se pudieron combinar los datos de CCL e IPC. Verifique que las fechas se solapen.")
+        st.stop()
+
+    hover_detallado = st.checkbox(
+        "Hover detallado",
+        value=False,
+        help="Muestra el hover unificado sobre el eje X. Puede ser más lento en series largas."
+    )
+    fig = build_figure(df_merged, hover_unificado=hover_detallado)
+    # theme=None: usar el template propio del gráfico (plotly_dark) sin el pase de estilos de Streamlit
+    st.plotly_chart(
+        fig,
+        use_container_width=True,
+        theme=None,
+        key="ccl_chart",
+        config={'displaylogo': False, 'scrollZoom': False, 'responsive': True}
+    )
+
+    # Expansor para mostrar los datos en una tabla
+    # (el formato se aplica en el navegador vía column_config, sin armar un Styler en Python)
+    with st.expander("Ver tabla de datos completos"):
+        st.dataframe(
+            df_merged[['fecha', 'ccl_nominal', 'ipc', 'ccl_ajustado']],
+            column_config={
+                'fecha': st.column_config.DateColumn(format='DD-MM-YYYY'),
+                'ccl_nominal': st.column_config.NumberColumn(format='dollar'),
+                'ipc': st.column_config.NumberColumn(format='%.2f'),
+                'ccl_ajustado': st.column_config.NumberColumn(format='dollar')
+            },
+            use_container_width=True
+        )
+
+except Exception as e:
+    st.error(f"Error procesando los datos: {e}")
+    st.error("Por favor, intente recargar la página o contacte al administrador.")
 
 st.markdown("---")
 st.caption("Fuente de Datos: CCL implícito calculado con GGAL/GGAL.BA (con respaldo de data912.com) | IPC Nacional desde datos.gob.ar.")